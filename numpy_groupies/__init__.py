@@ -18,8 +18,8 @@ else:
     from .aggregate_numpy import aggregate
     aggregate_np = aggregate
     from .aggregate_numpy_ufunc import aggregate as aggregate_ufunc
-    from .utils_numpy import (label_contiguous_1d, multi_arange, relabel_groups_masked,
-                              relabel_groups_unique, unpack)
+    from .utils_numpy import (RaggedGroups, label_contiguous_1d, multi_arange,
+                              relabel_groups_masked, relabel_groups_unique, unpack)
 
 
 try:
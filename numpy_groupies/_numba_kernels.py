@@ -0,0 +1,175 @@
+"""Optional numba-jitted inner loops for the numpy implementation of aggregate.
+
+``np.ufunc.at`` dispatches element by element through the python layer and is
+therefore very slow. Where numba is importable, the loops below provide
+drop-in replacements which LLVM compiles into tight native code. Importing
+this module fails with ``ImportError`` when numba is not installed, so any
+user of these kernels needs to guard the import and provide a plain numpy
+fallback.
+"""
+import numba as nb
+import numpy as np
+
+# Below this input length the thread pool launch and the per-thread partial
+# buffers cost more than the parallel summation saves
+PARALLEL_THRESHOLD = 100000
+
+# Entries per destination block of the cache-blocked summation; 2**15
+# float64 accumulators occupy 256KB and comfortably fit the L2 cache
+CACHE_BLOCK_SIZE = 32768
+
+
+# no cache=True: get_num_threads is a dynamic global under parallel=True,
+# which numba cannot cache and would warn about on every first call
+@nb.njit(nogil=True, parallel=True)
+def _sum_parallel(group_idx, a, size):
+    """Summation equivalent of np.bincount with weights, accumulating into
+    one privatized partial buffer per thread to avoid racing scatters."""
+    nthreads = nb.get_num_threads()
+    partial = np.zeros((nthreads, size), dtype=np.float64)
+    L = group_idx.size
+    for t in nb.prange(nthreads):
+        lo = t * L // nthreads
+        hi = (t + 1) * L // nthreads
+        for i in range(lo, hi):
+            partial[t, group_idx[i]] += a[i]
+    return partial.sum(axis=0)
+
+
+@nb.njit(nogil=True, cache=True)
+def _sum_blocked(group_idx, a, size, block):
+    """Summation for outputs too large to keep resident in cache. The input
+    is first partitioned by destination block of `block` entries, then each
+    block is accumulated on its own, so the scatter stores of the final pass
+    stay within an L2-sized subrange instead of hitting DRAM at random.
+    Elements of a group keep their input order, making the result bitwise
+    identical to np.bincount."""
+    n = group_idx.size
+    nblocks = (size + block - 1) // block
+    counts = np.zeros(nblocks, dtype=np.int64)
+    for i in range(n):
+        counts[group_idx[i] // block] += 1
+    pos = np.empty(nblocks, dtype=np.int64)
+    run = 0
+    for b in range(nblocks):
+        pos[b] = run
+        run += counts[b]
+    idx_part = np.empty(n, dtype=np.int64)
+    val_part = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        b = group_idx[i] // block
+        p = pos[b]
+        idx_part[p] = group_idx[i]
+        val_part[p] = a[i]
+        pos[b] = p + 1
+    ret = np.zeros(size, dtype=np.float64)
+    for i in range(n):
+        ret[idx_part[i]] += val_part[i]
+    return ret
+
+
+def generic_driver(fn):
+    """Build a jitted loop applying fn groupwise over the ragged
+    (values, offsets) layout, avoiding a python-level call per group.
+    Compilation of fn is deferred to the first call and fails with a typing
+    error for non-jittable callables, so callers need to catch that and
+    fall back to the python loop."""
+    jitfn = nb.njit(fn, nogil=True)
+
+    @nb.njit(nogil=True)
+    def driver(values, offsets, ret):
+        for i in range(offsets.size - 1):
+            lo, hi = offsets[i], offsets[i + 1]
+            if hi > lo:
+                ret[i] = jitfn(values[lo:hi])
+    return driver
+
+
+@nb.njit(nogil=True, cache=True)
+def _ravel_multi_index_kernel(multi_idx, dims):
+    """Linearize C-ordered multidimensional indices, fusing the per-dimension
+    bounds checks of np.ravel_multi_index(mode='raise') into the same pass.
+    Fortran order is handled by the caller reversing multi_idx and dims."""
+    ndim, n = multi_idx.shape
+    flat = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        lin = 0
+        for d in range(ndim):
+            idx = multi_idx[d, i]
+            if idx < 0 or idx >= dims[d]:
+                raise ValueError("invalid entry in coordinates array")
+            lin = lin * dims[d] + idx
+        flat[i] = lin
+    return flat
+
+
+@nb.njit(nogil=True, cache=True)
+def _prod_kernel(group_idx, a, ret):
+    for i in range(group_idx.size):
+        ret[group_idx[i]] *= a[i]
+
+
+@nb.njit(nogil=True, cache=True)
+def _all_kernel(group_idx, a, ret):
+    # nan compares unequal to 0 and therefore counts as truthy, like in
+    # np.logical_not
+    for i in range(group_idx.size):
+        if a[i] == 0:
+            ret[group_idx[i]] = False
+
+
+@nb.njit(nogil=True, cache=True)
+def _any_kernel(group_idx, a, ret):
+    for i in range(group_idx.size):
+        if a[i] != 0:
+            ret[group_idx[i]] = True
+
+
+@nb.njit(nogil=True, cache=True)
+def _last_kernel(group_idx, a, ret):
+    # repeated writes leave the last value of each group behind
+    for i in range(group_idx.size):
+        ret[group_idx[i]] = a[i]
+
+
+@nb.njit(nogil=True, cache=True)
+def _first_kernel(group_idx, a, ret):
+    # same as _last_kernel, but iterating in reverse
+    for i in range(group_idx.size - 1, -1, -1):
+        ret[group_idx[i]] = a[i]
+
+
+@nb.njit(nogil=True, cache=True)
+def _var_kernel(group_idx, a, size):
+    """Groupwise M2 (sum of squared deviations) via Welford's single-pass
+    update. Numerically stable where the E[x^2] - E[x]^2 shortcut cancels
+    catastrophically for data with a large mean."""
+    count = np.zeros(size)
+    mean = np.zeros(size)
+    m2 = np.zeros(size)
+    for i in range(group_idx.size):
+        ri = group_idx[i]
+        count[ri] += 1.0
+        delta = a[i] - mean[ri]
+        mean[ri] += delta / count[ri]
+        m2[ri] += delta * (a[i] - mean[ri])
+    return m2
+
+
+@nb.njit(nogil=True, cache=True)
+def _min_kernel(group_idx, a, ret):
+    for i in range(group_idx.size):
+        ri = group_idx[i]
+        val = a[i]
+        # the nan check keeps the nan propagation of np.minimum.at
+        if val < ret[ri] or val != val:
+            ret[ri] = val
+
+
+@nb.njit(nogil=True, cache=True)
+def _max_kernel(group_idx, a, ret):
+    for i in range(group_idx.size):
+        ri = group_idx[i]
+        val = a[i]
+        if val > ret[ri] or val != val:
+            ret[ri] = val
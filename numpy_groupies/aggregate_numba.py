@@ -47,10 +47,12 @@ class AggregateOp(object):
         check_fill_value(fill_value, dtype, func=self.func)
         input_dtype = type(a) if np.isscalar(a) else a.dtype
         ret, counter, mean, outer = self._initialize(flat_size, fill_value, dtype, input_dtype, group_idx.size)
-        group_idx = np.ascontiguousarray(group_idx)
+        if not group_idx.flags.c_contiguous:
+            group_idx = np.ascontiguousarray(group_idx)
 
         if not np.isscalar(a):
-            a = np.ascontiguousarray(a)
+            if not a.flags.c_contiguous:
+                a = np.ascontiguousarray(a)
             jitfunc = self._jit_non_scalar
         else:
             jitfunc = self._jit_scalar
@@ -203,7 +205,8 @@ class AggregateGeneric(AggregateOp):
         check_fill_value(fill_value, dtype, func=self.func)
         input_dtype = type(a) if np.isscalar(a) else a.dtype
         ret, _, _, _ = self._initialize(flat_size, fill_value, dtype, input_dtype, group_idx.size)
-        group_idx = np.ascontiguousarray(group_idx)
+        if not group_idx.flags.c_contiguous:
+            group_idx = np.ascontiguousarray(group_idx)
 
         sortidx = np.argsort(group_idx, kind='mergesort')
         self._jitfunc(sortidx, group_idx, a, ret)
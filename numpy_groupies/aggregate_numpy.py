@@ -1,8 +1,40 @@
 import numpy as np
 
 from .utils import aggregate_common_doc, check_boolean, funcs_no_separate_nan, get_func, isstr
-from .utils_numpy import (aliasing, check_dtype, check_fill_value, input_validation, iscomplexobj,
-                          minimum_dtype, minimum_dtype_scalar)
+from .utils_numpy import (RaggedGroups, aliasing, check_dtype, check_fill_value, input_validation,
+                          iscomplexobj, minimum_dtype, minimum_dtype_scalar)
+
+try:
+    # Optional replacements for the slow np.ufunc.at calls below
+    from . import _numba_kernels
+except ImportError:
+    _numba_kernels = None
+
+
+def _numba_ok(a):
+    """True when the optional numba kernels can handle a."""
+    if _numba_kernels is None or not isinstance(a, np.ndarray):
+        return False
+    if a.dtype.kind not in 'biufc':
+        return False  # object, datetime and other untypable dtypes
+    if a.dtype.kind == 'f' and a.dtype.itemsize < 4:
+        return False  # numba's CPU backend cannot compile float16
+    return True
+
+
+def _sum_by_group(group_idx, a, size):
+    """np.bincount with weights, handed over to the parallel numba kernel
+    for long inputs when available. The size bound keeps the per-thread
+    partial buffers from outgrowing the input itself."""
+    if _numba_ok(a) and len(a) > _numba_kernels.PARALLEL_THRESHOLD:
+        if size > 4 * _numba_kernels.CACHE_BLOCK_SIZE:
+            # output too large to stay cache resident, partition by
+            # destination block first
+            return _numba_kernels._sum_blocked(group_idx, a, size,
+                                               _numba_kernels.CACHE_BLOCK_SIZE)
+        if size <= len(a):
+            return _numba_kernels._sum_parallel(group_idx, a, size)
+    return np.bincount(group_idx, weights=a, minlength=size)
 
 
 def _sum(group_idx, a, size, fill_value, dtype=None):
@@ -10,8 +42,16 @@ def _sum(group_idx, a, size, fill_value, dtype=None):
 
     if np.ndim(a) == 0:
         ret = np.bincount(group_idx, minlength=size).astype(dtype)
+        if fill_value != 0:
+            # the plain bincount is the groupwise count, so it marks the
+            # untouched groups for free, saving the scatter pass that
+            # _fill_untouched would do over group_idx
+            untouched = ret == 0
         if a != 1:
             ret *= a
+        if fill_value != 0:
+            ret[untouched] = fill_value
+        return ret
     else:
         if iscomplexobj(a):
             ret = np.empty(size, dtype=dtype)
@@ -20,8 +60,7 @@ def _sum(group_idx, a, size, fill_value, dtype=None):
             ret.imag = np.bincount(group_idx, weights=a.imag,
                                    minlength=size)
         else:
-            ret = np.bincount(group_idx, weights=a,
-                              minlength=size).astype(dtype)
+            ret = _sum_by_group(group_idx, a, size).astype(dtype)
 
     if fill_value != 0:
         _fill_untouched(group_idx, ret, fill_value)
@@ -33,7 +72,10 @@ def _prod(group_idx, a, size, fill_value, dtype=None):
     ret = np.full(size, fill_value, dtype=dtype)
     if fill_value != 1:
         ret[group_idx] = 1  # product starts from 1
-    np.multiply.at(ret, group_idx, a)
+    if _numba_ok(a):
+        _numba_kernels._prod_kernel(group_idx, a, ret)
+    else:
+        np.multiply.at(ret, group_idx, a)
     return ret
 
 
@@ -41,60 +83,108 @@ def _len(group_idx, a, size, fill_value, dtype=None):
     return _sum(group_idx, 1, size, fill_value, dtype=int)
 
 
+def _scalar_result(group_idx, a, size, fill_value, dtype):
+    # with scalar a, first/last/min/max of every touched group is trivially
+    # a itself, so the weightless bincount is the whole computation
+    touched = np.bincount(group_idx, minlength=size) > 0
+    return np.where(touched, a, fill_value).astype(dtype)
+
+
 def _last(group_idx, a, size, fill_value, dtype=None):
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, a, size, fill_value,
+                              minimum_dtype_scalar(fill_value, dtype, a))
     dtype = minimum_dtype(fill_value, dtype or a.dtype)
-    ret = np.full(size, fill_value, dtype=dtype)
+    if _numba_ok(a):
+        ret = np.full(size, fill_value, dtype=dtype)
+        _numba_kernels._last_kernel(group_idx, a, ret)
+        return ret
     # repeated indexing gives last value, see:
     # the phrase "leaving behind the last value"  on this page:
     # http://wiki.scipy.org/Tentative_NumPy_Tutorial
+    ret = np.empty(size, dtype=dtype)
     ret[group_idx] = a
+    # only the untouched groups need fill_value, saving the full-size
+    # initialization that the scatter above would largely overwrite
+    _fill_untouched(group_idx, ret, fill_value)
     return ret
 
 
 def _first(group_idx, a, size, fill_value, dtype=None):
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, a, size, fill_value,
+                              minimum_dtype_scalar(fill_value, dtype, a))
     dtype = minimum_dtype(fill_value, dtype or a.dtype)
-    ret = np.full(size, fill_value, dtype=dtype)
+    if _numba_ok(a):
+        ret = np.full(size, fill_value, dtype=dtype)
+        _numba_kernels._first_kernel(group_idx, a, ret)
+        return ret
+    ret = np.empty(size, dtype=dtype)
     ret[group_idx[::-1]] = a[::-1]  # same trick as _last, but in reverse
+    _fill_untouched(group_idx, ret, fill_value)
     return ret
 
 
 def _all(group_idx, a, size, fill_value, dtype=None):
     check_boolean(fill_value)
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, bool(a), size, fill_value, bool)
     ret = np.full(size, fill_value, dtype=bool)
     if not fill_value:
         ret[group_idx] = True
-    ret[group_idx.compress(np.logical_not(a))] = False
+    if _numba_ok(a):
+        # single streaming pass, no logical_not/compress intermediates
+        _numba_kernels._all_kernel(group_idx, a, ret)
+    else:
+        ret[group_idx.compress(np.logical_not(a))] = False
     return ret
 
 
 def _any(group_idx, a, size, fill_value, dtype=None):
     check_boolean(fill_value)
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, bool(a), size, fill_value, bool)
     ret = np.full(size, fill_value, dtype=bool)
     if fill_value:
         ret[group_idx] = False
-    ret[group_idx.compress(a)] = True
+    if _numba_ok(a):
+        _numba_kernels._any_kernel(group_idx, a, ret)
+    else:
+        ret[group_idx.compress(a)] = True
     return ret
 
 
 def _min(group_idx, a, size, fill_value, dtype=None):
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, a, size, fill_value,
+                              minimum_dtype_scalar(fill_value, dtype, a))
     dtype = minimum_dtype(fill_value, dtype or a.dtype)
     dmax = np.iinfo(a.dtype).max if issubclass(a.dtype.type, np.integer)\
         else np.finfo(a.dtype).max
     ret = np.full(size, fill_value, dtype=dtype)
     if fill_value != dmax:
         ret[group_idx] = dmax  # min starts from maximum
-    np.minimum.at(ret, group_idx, a)
+    if _numba_ok(a) and not iscomplexobj(a) and not iscomplexobj(ret):
+        _numba_kernels._min_kernel(group_idx, a, ret)
+    else:
+        np.minimum.at(ret, group_idx, a)
     return ret
 
 
 def _max(group_idx, a, size, fill_value, dtype=None):
+    if np.ndim(a) == 0:
+        return _scalar_result(group_idx, a, size, fill_value,
+                              minimum_dtype_scalar(fill_value, dtype, a))
     dtype = minimum_dtype(fill_value, dtype or a.dtype)
     dmin = np.iinfo(a.dtype).min if issubclass(a.dtype.type, np.integer)\
         else np.finfo(a.dtype).min
     ret = np.full(size, fill_value, dtype=dtype)
     if fill_value != dmin:
         ret[group_idx] = dmin  # max starts from minimum
-    np.maximum.at(ret, group_idx, a)
+    if _numba_ok(a) and not iscomplexobj(a) and not iscomplexobj(ret):
+        _numba_kernels._max_kernel(group_idx, a, ret)
+    else:
+        np.maximum.at(ret, group_idx, a)
     return ret
 
 
@@ -136,12 +226,14 @@ def _mean(group_idx, a, size, fill_value, dtype=np.dtype(np.float64)):
         sums.imag = np.bincount(group_idx, weights=a.imag,
                                 minlength=size)
     else:
-        sums = np.bincount(group_idx, weights=a,
-                           minlength=size).astype(dtype)
+        sums = _sum_by_group(group_idx, a, size).astype(dtype)
 
     with np.errstate(divide='ignore', invalid='ignore'):
         ret = sums.astype(dtype) / counts
-    if not np.isnan(fill_value):
+    if not np.isnan(fill_value) and counts.size and \
+            (counts.size > group_idx.size or counts.min() == 0):
+        # only build the mask when empty groups actually exist; the min
+        # reduction is a single pass over the much smaller counts array
         ret[counts == 0] = fill_value
     return ret
 
@@ -151,14 +243,22 @@ def _var(group_idx, a, size, fill_value, dtype=np.dtype(np.float64),
     if np.ndim(a) == 0:
         raise ValueError("cannot take variance with scalar a")
     counts = np.bincount(group_idx, minlength=size)
-    sums = np.bincount(group_idx, weights=a, minlength=size)
     with np.errstate(divide='ignore', invalid='ignore'):
-        means = sums.astype(dtype) / counts
-        ret = np.bincount(group_idx, (a - means[group_idx]) ** 2,
-                          minlength=size) / (counts - ddof)
+        if _numba_ok(a) and not iscomplexobj(a):
+            # single pass and no full-length temporary, and unlike the
+            # E[x^2] - E[x]^2 shortcut the Welford update cannot cancel
+            # catastrophically for data with a large mean
+            m2 = _numba_kernels._var_kernel(group_idx, a, size)
+            ret = m2.astype(dtype, copy=False) / (counts - ddof)
+        else:
+            sums = np.bincount(group_idx, weights=a, minlength=size)
+            means = sums.astype(dtype) / counts
+            ret = np.bincount(group_idx, (a - means[group_idx]) ** 2,
+                              minlength=size) / (counts - ddof)
     if sqrt:
         ret = np.sqrt(ret)  # this is now std not var
-    if not np.isnan(fill_value):
+    if not np.isnan(fill_value) and counts.size and \
+            (counts.size > group_idx.size or counts.min() == 0):
         ret[counts == 0] = fill_value
     return ret
 
@@ -181,7 +281,11 @@ def _anynan(group_idx, a, size, fill_value, dtype=bool):
 def _sort(group_idx, a, size=None, fill_value=None, dtype=None, reverse=False):
     sortidx = np.lexsort((-a if reverse else a, group_idx))
     # Reverse sorting back to into grouped order, but preserving groupwise sorting
-    revidx = np.argsort(np.argsort(group_idx, kind='mergesort'), kind='mergesort')
+    # revidx is the inverse permutation of the stable groupwise order, scattered
+    # directly instead of paying for a second mergesort
+    order = np.argsort(group_idx, kind='mergesort')
+    revidx = np.empty_like(order)
+    revidx[order] = np.arange(len(order))
     return a[sortidx][revidx]
 
 
@@ -193,11 +297,16 @@ def _array(group_idx, a, size, fill_value, dtype=None):
                          "sequence")
     order_group_idx = np.argsort(group_idx, kind='mergesort')
     counts = np.bincount(group_idx, minlength=size)
-    ret = np.split(a[order_group_idx], np.cumsum(counts)[:-1])
-    ret = np.asanyarray(ret, dtype="object")
-    if fill_value is None or np.isscalar(fill_value):
-        _fill_untouched(group_idx, ret, fill_value)
-    return ret
+    offsets = np.zeros(size + 1, dtype=int)
+    np.cumsum(counts, out=offsets[1:])
+    return RaggedGroups(a[order_group_idx], offsets, fill_value)
+
+
+# Compiled drivers for _generic_callable, keyed by the wrapped callable;
+# None marks callables numba failed to compile. Bounded so throwaway
+# lambdas cannot accumulate dispatchers without limit
+_generic_jit_cache = {}
+_GENERIC_JIT_CACHE_SIZE = 64
 
 
 def _generic_callable(group_idx, a, size, fill_value, dtype=None,
@@ -207,6 +316,29 @@ def _generic_callable(group_idx, a, size, fill_value, dtype=None,
     groups = _array(group_idx, a, size, ())
     ret = np.full(size, fill_value, dtype=dtype or np.float64)
 
+    # jit compilation of func costs a good fraction of a second, which only
+    # pays off against the python loop for long inputs
+    if _numba_ok(a) and len(a) > _numba_kernels.PARALLEL_THRESHOLD:
+        if func not in _generic_jit_cache:
+            if len(_generic_jit_cache) >= _GENERIC_JIT_CACHE_SIZE:
+                # evict the oldest dispatcher; dicts keep insertion order
+                _generic_jit_cache.pop(next(iter(_generic_jit_cache)))
+            try:
+                _generic_jit_cache[func] = _numba_kernels.generic_driver(func)
+            except Exception:
+                # nb.njit rejects anything but plain python functions, e.g.
+                # functools.partial or callable instances
+                _generic_jit_cache[func] = None
+        driver = _generic_jit_cache[func]
+        if driver is not None:
+            try:
+                driver(groups.values, groups.offsets, ret)
+            except Exception:
+                # func is not jittable, stay on the python loop
+                _generic_jit_cache[func] = None
+            else:
+                return ret
+
     for i, grp in enumerate(groups):
         if np.ndim(grp) == 1 and len(grp) > 0:
             ret[i] = func(grp)
@@ -241,6 +373,11 @@ def _nancumsum(group_idx, a, size, fill_value=None, dtype=None):
     return _cumsum(group_idx_nonans, a_nonans, size, fill_value=fill_value, dtype=dtype)
 
 
+# Functions whose hot path is np.bincount, which casts its index argument
+# back to intp and therefore gains nothing from a narrowed group_idx
+_bincount_based = frozenset(('sum', 'len', 'mean', 'var', 'std',
+                             'nansum', 'nanlen', 'nanmean', 'nanvar', 'nanstd'))
+
 _impl_dict = dict(min=_min, max=_max, sum=_sum, prod=_prod, last=_last,
                   first=_first, all=_all, any=_any, mean=_mean, std=_std,
                   var=_var, anynan=_anynan, allnan=_allnan, sort=_sort,
@@ -277,6 +414,13 @@ def _aggregate_base(group_idx, a, func='sum', size=None, fill_value=0,
 
         dtype = check_dtype(dtype, func, a, flat_size)
         check_fill_value(fill_value, dtype, func=func)
+        if _numba_kernels is not None and func not in _bincount_based \
+                and group_idx.dtype.itemsize > 4 \
+                and flat_size < np.iinfo(np.int32).max:
+            # input_validation already checked the indices against flat_size,
+            # so the key array can safely be narrowed, halving its bandwidth
+            # in the scatter/gather passes of the jitted kernels
+            group_idx = group_idx.astype(np.int32)
         func = _impl_dict[func]
         ret = func(group_idx, a, flat_size, fill_value=fill_value, dtype=dtype,
                    **kwargs)
@@ -285,6 +429,10 @@ def _aggregate_base(group_idx, a, func='sum', size=None, fill_value=0,
     if ndim_idx > 1:
         if unravel_shape is not None:
             ret = np.unravel_index(ret, unravel_shape)[axis]
+        if isinstance(ret, RaggedGroups):
+            # the flat ragged layout has no multidimensional form; unpack
+            # into the reshapeable object array of old
+            ret = ret.as_object_array()
         ret = ret.reshape(size, order=order)
     return ret
 
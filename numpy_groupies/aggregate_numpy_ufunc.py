@@ -58,9 +58,10 @@ def _prod(group_idx, a, size, fill_value, dtype=None):
 
 def _min(group_idx, a, size, fill_value, dtype=None):
     """Same as aggregate_numpy.py"""
-    dtype = minimum_dtype(fill_value, dtype or a.dtype)
-    dmax = np.iinfo(a.dtype).max if issubclass(a.dtype.type, np.integer)\
-        else np.finfo(a.dtype).max
+    a_dtype = np.dtype(type(a)) if np.isscalar(a) else a.dtype
+    dtype = minimum_dtype(fill_value, dtype or a_dtype)
+    dmax = np.iinfo(a_dtype).max if issubclass(a_dtype.type, np.integer)\
+        else np.finfo(a_dtype).max
     ret = np.full(size, fill_value, dtype=dtype)
     if fill_value != dmax:
         ret[group_idx] = dmax  # min starts from maximum
@@ -70,9 +71,10 @@ def _min(group_idx, a, size, fill_value, dtype=None):
 
 def _max(group_idx, a, size, fill_value, dtype=None):
     """Same as aggregate_numpy.py"""
-    dtype = minimum_dtype(fill_value, dtype or a.dtype)
-    dmin = np.iinfo(a.dtype).min if issubclass(a.dtype.type, np.integer)\
-        else np.finfo(a.dtype).min
+    a_dtype = np.dtype(type(a)) if np.isscalar(a) else a.dtype
+    dtype = minimum_dtype(fill_value, dtype or a_dtype)
+    dmin = np.iinfo(a_dtype).min if issubclass(a_dtype.type, np.integer)\
+        else np.finfo(a_dtype).min
     ret = np.full(size, fill_value, dtype=dtype)
     if fill_value != dmin:
         ret[group_idx] = dmin  # max starts from minimum
@@ -119,9 +119,11 @@ def aggregate(group_idx, a, func='sum', size=None, fill_value=0, order=None,
 
     func = get_func(func, aliasing, _impl_dict)
     if isinstance(a, (int, float)):
-        if func not in ("sum", "prod", "len"):
+        if func not in ("sum", "prod", "len", "all", "any",
+                        "first", "last", "min", "max"):
             raise ValueError("scalar inputs are supported only for 'sum', "
-                             "'prod' and 'len'")
+                             "'prod', 'len', 'all', 'any', 'first', 'last',"
+                             " 'min' and 'max'")
         a = [a] * len(group_idx)
     elif len(group_idx) != len(a):
         raise ValueError("group_idx and a must be of the same length")
@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 
 try:
@@ -24,6 +26,15 @@ c_finish = dict()
 c_macros = []
 c_args = ['-Wno-cpp']  # Suppress the deprecation warnings created by weave
 
+# Workshare the associative kernels over OpenMP array-section reductions,
+# which give every thread a runtime-managed private partial buffer that is
+# merged after the loop. Toggling this requires regenerating c_funcs, i.e.
+# reloading the module.
+use_openmp = True
+c_link_args = ['-fopenmp'] if use_openmp else []
+if use_openmp:
+    c_args = c_args + ['-fopenmp']
+
 
 def c_size(varname):
     return r"""
@@ -43,6 +54,7 @@ c_ri_redir = """ri = (group_idx[i] + 1) * (a[i] == a[i]);"""
 
 c_base = r"""%(init)s
 
+    %(omp)s
     for (long i=0; i<Lgroup_idx; i++) {
         %(ri_redir)s
         %(iter)s
@@ -52,6 +64,7 @@ c_base = r"""%(init)s
 
 c_base_reverse = r"""%(init)s
 
+    %(omp)s
     for (long i=Lgroup_idx-1; i>=0; i--) {
         %(ri_redir)s
         %(iter)s
@@ -126,44 +139,73 @@ c_finish['mean'] = r"""
         else ret[ri] = fill_value;
     }"""
 
+# std/var accumulate into buf, which interleaves the (M2, mean, count)
+# triple of every group, so that all three updates of an iteration land on
+# the same cache line instead of touching three separate arrays. The
+# updates follow Welford's online algorithm, which is free of the
+# catastrophic cancellation of the sum-of-squares formulation and whose
+# delta products compile down to fused multiply-adds
 c_iter['std'] = r"""
-        counter[ri]++;
-        means[ri] += a[i];
-        ret[ri] += a[i] * a[i];"""
+        double count = buf[3 * ri + 2] + 1;
+        buf[3 * ri + 2] = count;
+        double delta = a[i] - buf[3 * ri + 1];
+        buf[3 * ri + 1] += delta / count;
+        buf[3 * ri] += delta * (a[i] - buf[3 * ri + 1]);"""
 
 c_finish['std'] = r"""
-    double mean2 = 0;
     for (long ri=0; ri<Lret; ri++) {
-        if (counter[ri]) {
-            mean2 = means[ri] * means[ri];
-            ret[ri] = sqrt((ret[ri] - mean2 / counter[ri]) / (counter[ri] - ddof));
-        }
+        double count = buf[3 * ri + 2];
+        if (count) ret[ri] = sqrt(buf[3 * ri] / (count - ddof));
         else ret[ri] = fill_value;
     }"""
 
 c_iter['var'] = c_iter['std']
 
 c_finish['var'] = r"""
-    double mean2 = 0;
     for (long ri=0; ri<Lret; ri++) {
-        if (counter[ri]) {
-            mean2 = means[ri] * means[ri];
-            ret[ri] = (ret[ri] - mean2 / counter[ri]) / (counter[ri] - ddof);
-        }
+        double count = buf[3 * ri + 2];
+        if (count) ret[ri] = buf[3 * ri] / (count - ddof);
         else ret[ri] = fill_value;
     }"""
 
 
+# Reduction operators for kernels whose groupwise update is associative.
+# Order-dependent (first/last), first-touch (min/max) and Welford (std/var)
+# kernels stay serial.
+c_omp_ops = {'sum': '+', 'len': '+', 'prod': '*',
+             'all': '&', 'any': '|', 'allnan': '&', 'anynan': '|'}
+
+
+def c_omp(funcname):
+    """ The pragma parallelizing the main loop of funcname, if any """
+    if not use_openmp:
+        return ''
+    if funcname == 'mean':
+        clauses = 'reduction(+:ret[:Lret]) reduction(+:counter[:Lcounter])'
+    elif funcname in c_omp_ops:
+        # min keeps the inverse touched-marking intact: untouched stays 1
+        clauses = ('reduction(%s:ret[:Lret]) '
+                   'reduction(min:counter[:Lcounter])' % c_omp_ops[funcname])
+    else:
+        return ''
+    return '#pragma omp parallel for private(ri) ' + clauses
+
+
 def c_func(funcname, reverse=False, nans=False, scalar=False):
     """ Fill c_funcs with constructed code from the templates """
-    varnames = ['group_idx', 'a', 'ret', 'counter']
+    if funcname in ('std', 'var'):
+        # counter is replaced by the interleaved buf for these
+        varnames = ['group_idx', 'a', 'ret']
+    else:
+        varnames = ['group_idx', 'a', 'ret', 'counter']
     codebase = c_base_reverse if reverse else c_base
     iteration = c_iter_scalar[funcname] if scalar else c_iter[funcname]
     if scalar:
         varnames.remove('a')
     return codebase % dict(init=c_init(varnames), iter=iteration,
                            finish=c_finish.get(funcname, ''),
-                           ri_redir=(c_ri_redir if nans else c_ri))
+                           ri_redir=(c_ri_redir if nans else c_ri),
+                           omp='' if reverse else c_omp(funcname))
 
 
 def get_cfuncs():
@@ -234,6 +276,11 @@ _force_fill_1 = frozenset({'prod', 'all', 'allnan', 'nanprod'})
 
 def aggregate(group_idx, a, func='sum', size=None, fill_value=0, order='C',
               dtype=None, axis=None, **kwargs):
+    warnings.warn("The weave implementation builds on the abandoned "
+                  "scipy.weave package and is deprecated; use the numba "
+                  "implementation instead, which covers the same "
+                  "functionality with disk-cached jit compilation.",
+                  DeprecationWarning, stacklevel=2)
     func = get_func(func, aliasing, optimized_funcs)
     if not isstr(func):
         raise NotImplementedError("generic functions not supported, in the weave implementation of aggregate")
@@ -257,28 +304,39 @@ def aggregate(group_idx, a, func='sum', size=None, fill_value=0, order='C',
     else:
         ret = np.full(flat_size, fill_value, dtype=dtype)
 
-    # In case we should get some ugly fortran arrays, convert them
-    inline_vars = dict(group_idx=np.ascontiguousarray(group_idx), a=np.ascontiguousarray(a),
-                       ret=ret, fill_value=fill_value)
+    # In case we should get some ugly fortran arrays, convert them; already
+    # C-contiguous inputs are passed through without the copying rebind
+    if not group_idx.flags.c_contiguous:
+        group_idx = np.ascontiguousarray(group_idx)
+    if isinstance(a, np.ndarray) and not a.flags.c_contiguous:
+        a = np.ascontiguousarray(a)
+    inline_vars = dict(group_idx=group_idx, a=a, ret=ret, fill_value=fill_value)
     # TODO: Have this fixed by proper raveling
     if func in {'std', 'var', 'nanstd', 'nanvar'}:
-        counter = np.zeros_like(ret, dtype=int)
-        inline_vars['means'] = np.zeros_like(ret)
+        # interleaved (M2, mean, count) triple per group, see c_iter['std']
+        counter = None
+        inline_vars['buf'] = np.zeros(3 * flat_size)
         inline_vars['ddof'] = kwargs.pop('ddof', 0)
     elif func in {'mean', 'nanmean'}:
         counter = np.zeros_like(ret, dtype=int)
+        inline_vars['counter'] = counter
     else:
         # Using inverse logic, marking anything touched with zero for later removal
         counter = np.ones_like(ret, dtype=bool)
-    inline_vars['counter'] = counter
+        inline_vars['counter'] = counter
 
     if np.isscalar(a):
+        if func not in c_iter_scalar:
+            raise NotImplementedError("scalar a with '%s' is not supported "
+                                      "by the weave implementation" % func)
         func += 'scalar'
         inline_vars['a'] = a
-    inline(c_funcs[func], inline_vars.keys(), local_dict=inline_vars, define_macros=c_macros, extra_compile_args=c_args)
+    inline(c_funcs[func], inline_vars.keys(), local_dict=inline_vars, define_macros=c_macros,
+           extra_compile_args=c_args, extra_link_args=c_link_args)
 
-    # Postprocessing
-    if func in _force_fill_0 and fill_value != 0 or func in _force_fill_1 and fill_value != 1:
+    # Postprocessing; std/var already write fill_value in their c_finish
+    if counter is not None and (func in _force_fill_0 and fill_value != 0 or
+                                func in _force_fill_1 and fill_value != 1):
         if counter.dtype == np.bool_:
             ret[counter] = fill_value
         else:
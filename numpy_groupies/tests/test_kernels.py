@@ -0,0 +1,55 @@
+""" Direct tests for the optional numba kernels used by aggregate_numpy. """
+
+import numpy as np
+import pytest
+
+_numba_kernels = pytest.importorskip("numpy_groupies._numba_kernels")
+
+
+def test_sum_parallel_matches_bincount():
+    rnd = np.random.RandomState(seed=100)
+    group_idx = rnd.randint(0, 1000, size=100000)
+    a = rnd.randn(group_idx.size)
+    res = _numba_kernels._sum_parallel(group_idx, a, 1000)
+    ref = np.bincount(group_idx, weights=a, minlength=1000)
+    np.testing.assert_allclose(res, ref)
+
+
+def test_sum_blocked_matches_bincount():
+    rnd = np.random.RandomState(seed=100)
+    size = 200000
+    group_idx = rnd.randint(0, size, size=150000)
+    a = rnd.randn(group_idx.size)
+    res = _numba_kernels._sum_blocked(group_idx, a, size,
+                                      _numba_kernels.CACHE_BLOCK_SIZE)
+    ref = np.bincount(group_idx, weights=a, minlength=size)
+    # groupwise accumulation order is preserved, so results match exactly
+    np.testing.assert_array_equal(res, ref)
+
+
+def test_ravel_multi_index_kernel():
+    rnd = np.random.RandomState(seed=100)
+    dims = np.array([10, 7, 13])
+    multi_idx = np.vstack([rnd.randint(0, d, size=1000) for d in dims])
+    res = _numba_kernels._ravel_multi_index_kernel(multi_idx, dims)
+    ref = np.ravel_multi_index(multi_idx, dims, mode='raise')
+    np.testing.assert_array_equal(res, ref)
+
+    multi_idx[1, 3] = 7  # out of bounds
+    with pytest.raises(ValueError):
+        _numba_kernels._ravel_multi_index_kernel(multi_idx, dims)
+
+
+def test_prod_min_max_kernels():
+    rnd = np.random.RandomState(seed=100)
+    group_idx = rnd.randint(0, 100, size=10000)
+    a = rnd.randn(group_idx.size)
+
+    for kernel, ufunc, start in [(_numba_kernels._prod_kernel, np.multiply, 1.0),
+                                 (_numba_kernels._min_kernel, np.minimum, np.inf),
+                                 (_numba_kernels._max_kernel, np.maximum, -np.inf)]:
+        res = np.full(100, start)
+        kernel(group_idx, a, res)
+        ref = np.full(100, start)
+        ufunc.at(ref, group_idx, a)
+        np.testing.assert_allclose(res, ref)
@@ -1,12 +1,42 @@
 import numpy as np
+import pytest
 
-from ..utils_numpy import check_dtype, unpack
+from ..utils_numpy import RaggedGroups, check_dtype, unpack
 
 def test_check_dtype():
     dtype = check_dtype(None, "mean", np.arange(10, dtype=int), 10)
     assert np.issubdtype(dtype, np.floating)
 
 
+def test_ragged_groups():
+    values = np.arange(5)
+    offsets = np.array([0, 2, 2, 5])
+    groups = RaggedGroups(values, offsets, fill_value=-1)
+    assert len(groups) == 3
+    np.testing.assert_array_equal(groups[0], [0, 1])
+    assert groups[1] == -1  # empty group yields fill_value
+    np.testing.assert_array_equal(groups[2], [2, 3, 4])
+    np.testing.assert_array_equal(groups[-1], [2, 3, 4])
+    assert groups[-2] == -1
+    for bad in (3, -4):
+        with pytest.raises(IndexError):
+            groups[bad]
+    sliced = groups[0:2]
+    assert sliced.dtype == object
+    np.testing.assert_array_equal(sliced[0], [0, 1])
+    assert sliced[1] == -1
+    fancy = groups[np.array([2, 0])]
+    np.testing.assert_array_equal(fancy[0], [2, 3, 4])
+    np.testing.assert_array_equal(fancy[1], [0, 1])
+    masked = groups[np.array([True, False, True])]
+    assert len(masked) == 2
+    with pytest.raises(TypeError):
+        groups[np.array([0.5, 1.5])]
+    obj = groups.as_object_array()
+    assert obj.dtype == object
+    np.testing.assert_array_equal(obj[2], [2, 3, 4])
+
+
 def test_unpack():
     """Keep this test, in case unpack might get reimplemented again at some point."""
     group_idx = np.arange(10)
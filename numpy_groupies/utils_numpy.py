@@ -3,6 +3,12 @@ import numpy as np
 
 from .utils import check_boolean, get_aliasing
 
+try:
+    # Optional jitted replacement for np.ravel_multi_index below
+    from . import _numba_kernels
+except ImportError:
+    _numba_kernels = None
+
 _alias_numpy = {
     np.add: 'sum',
     np.sum: 'sum',
@@ -116,9 +122,11 @@ _forced_same_type = {'min', 'max', 'first', 'last', 'nanmin', 'nanmax',
 
 def check_dtype(dtype, func_str, a, n):
     if np.isscalar(a) or not a.shape:
-        if func_str not in ("sum", "prod", "len"):
+        if func_str not in ("sum", "prod", "len", "all", "any",
+                            "first", "last", "min", "max"):
             raise ValueError("scalar inputs are supported only for 'sum', "
-                             "'prod' and 'len'")
+                             "'prod', 'len', 'all', 'any', 'first', 'last',"
+                             " 'min' and 'max'")
         a_dtype = np.dtype(type(a))
     else:
         a_dtype = a.dtype
@@ -188,6 +196,20 @@ def check_group_idx(group_idx, a=None, check_min=True):
         raise ValueError("group_idx contains negative indices")
 
 
+def _ravel_multi_index(multi_idx, dims, order):
+    """np.ravel_multi_index with mode='raise', fusing the linearization and
+    the bounds checks into a single jitted pass when numba is available."""
+    if _numba_kernels is not None and isinstance(multi_idx, np.ndarray) \
+            and multi_idx.ndim == 2:
+        dims = np.asarray(dims, dtype=np.int64)
+        if order == 'F':
+            # Fortran order linearizes with the leading dimension fastest
+            multi_idx = multi_idx[::-1]
+            dims = dims[::-1]
+        return _numba_kernels._ravel_multi_index_kernel(multi_idx, dims)
+    return np.ravel_multi_index(multi_idx, dims, order=order, mode='raise')
+
+
 def _ravel_group_idx(group_idx, a, axis, size, order, method="ravel"):
     ndim_a = a.ndim
     # Create the broadcast-ready multidimensional indexing.
@@ -249,8 +271,10 @@ def input_validation(group_idx, a, size=None, order='C', axis=None,
     if not np.issubdtype(group_idx.dtype, np.integer):
         raise TypeError("group_idx must be of integer type")
 
-    # This check works for multidimensional indexing as well
-    if check_bounds and np.any(group_idx < 0):
+    # This check works for multidimensional indexing as well. A scalar
+    # reduction is used instead of np.any(group_idx < 0), which would
+    # allocate a full-size boolean temporary
+    if check_bounds and group_idx.size and np.min(group_idx) < 0:
         raise ValueError("negative indices not supported")
 
     ndim_idx = np.ndim(group_idx)
@@ -296,7 +320,7 @@ def input_validation(group_idx, a, size=None, order='C', axis=None,
         else:
             if not np.isscalar(size):
                 raise ValueError("output size must be scalar or None")
-            if check_bounds and np.any(group_idx > size - 1):
+            if check_bounds and group_idx.size and np.max(group_idx) > size - 1:
                 raise ValueError("one or more indices are too large for "
                                  "size %d" % size)
         flat_size = size
@@ -311,8 +335,7 @@ def input_validation(group_idx, a, size=None, order='C', axis=None,
                              "specified in index" % (len(size),
                                                      len(group_idx)))
         if ravel_group_idx:
-            group_idx = np.ravel_multi_index(group_idx, size, order=order,
-                                             mode='raise')
+            group_idx = _ravel_multi_index(group_idx, size, order)
         flat_size = np.prod(size)
 
     if not (np.ndim(a) == 0 or len(a) == group_idx.size):
@@ -325,6 +348,71 @@ def input_validation(group_idx, a, size=None, order='C', axis=None,
 ### General tools ###
 
 
+class RaggedGroups(object):
+    """ Compact result of the "array" aggregation. The grouped values are
+        kept in a single contiguous array, and group ``i`` is the view
+        ``values[offsets[i]:offsets[i + 1]]``, avoiding one small ndarray
+        allocation per group. Groups without any members evaluate to
+        ``fill_value``, matching the object-array behaviour of old.
+    """
+
+    def __init__(self, values, offsets, fill_value=None):
+        self.values = values
+        self.offsets = offsets
+        self.fill_value = fill_value
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._take(range(*i.indices(len(self))))
+        if isinstance(i, (list, np.ndarray)):
+            idx = np.asarray(i)
+            if idx.dtype.kind == 'b':
+                return self._take(np.flatnonzero(idx))
+            if idx.dtype.kind not in 'iu':
+                raise TypeError("group indices must be integers or a "
+                                "boolean mask")
+            ret = self._take(idx.ravel())
+            return ret.reshape(idx.shape) if idx.ndim > 1 else ret
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("group index out of range")
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        if lo == hi and (self.fill_value is None or np.isscalar(self.fill_value)):
+            return self.fill_value
+        return self.values[lo:hi]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def _take(self, indices):
+        """Unpack the selected groups into an object-dtype array, with the
+        same per-group semantics as scalar indexing."""
+        ret = np.empty(len(indices), dtype=object)
+        for k, i in enumerate(indices):
+            ret[k] = self[int(i)]
+        return ret
+
+    def as_object_array(self):
+        """ Unpack into an object-dtype array of small arrays, for
+            backwards compatibility. The array is preallocated and filled
+            group by group, never going through np.asarray, which is both
+            ambiguous and slow for lists of arrays. """
+        ret = np.empty(len(self), dtype=object)
+        bounds = self.offsets.tolist()  # python ints slice faster
+        values = self.values
+        scalar_fill = self.fill_value is None or np.isscalar(self.fill_value)
+        for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+            if lo == hi and scalar_fill:
+                ret[i] = self.fill_value
+            else:
+                ret[i] = values[lo:hi]
+        return ret
+
+
 def unpack(group_idx, ret):
     """ Take an aggregate packed array and uncompress it to the size of group_idx.
         This is equivalent to ret[group_idx].